@@ -19,15 +19,31 @@ __author__ = "Subhobhai"
 __email__ = "subhobhai943@example.com"
 __description__ = "Multi-AI API Integration CLI for Termux"
 
-from .cli import main
-from .config import ConfigManager
-from .api_clients import AIClientManager
-from .utils import print_banner, check_termux_environment
+import importlib
+
+# Public names are imported on first access (PEP 562) so that light commands
+# such as --list-providers do not pay for importing requests at startup.
+_LAZY_ATTRS = {
+    'main': '.cli',
+    'ConfigManager': '.config',
+    'get_config': '.config',
+    'AIClientManager': '.api_clients',
+    'print_banner': '.utils',
+    'check_termux_environment': '.utils',
+}
 
 __all__ = [
     'main',
     'ConfigManager', 
+    'get_config',
     'AIClientManager',
     'print_banner',
     'check_termux_environment'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name, __name__), name)
@@ -5,11 +5,25 @@ Supports OpenAI, Anthropic, Google Gemini, Cohere, and Hugging Face APIs
 
 import requests
 import json
-from typing import Dict, Any, Optional, Iterator, Union, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional, Iterable, Iterator, Union, List, Callable, Tuple
 from abc import ABC, abstractmethod
 
+from .cache import ResponseCache
 from .config import ConfigManager
-from .utils import handle_error
+from .utils import handle_error, json_dumps, json_loads
+
+
+# Transient statuses worth retrying (429 honours the Retry-After header)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Read size for streamed responses; chunked transfer still yields per HTTP chunk
+STREAM_CHUNK_SIZE = 65536
+
+# Server-sent event framing used by the OpenAI and Anthropic streams
+SSE_DATA_PREFIX = b'data: '
+SSE_DONE = b'[DONE]'
 
 
 class BaseAIClient(ABC):
@@ -17,6 +31,73 @@ class BaseAIClient(ABC):
     
     def __init__(self, api_key: str):
         self.api_key = api_key
+        
+        # Shared session so keep-alive connections are reused across prompts
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=2,  # 3 attempts in all
+                backoff_factor=0.3,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=None,  # Retry POST as well
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        """POST to the API, retrying transient failures, and raise on HTTP errors."""
+        response = self.session.post(url, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def _iter_sse(self, response, extract: Callable[[Dict[str, Any]], Iterable[str]], prefixed: bool = True) -> Iterator[str]:
+        """Decode a streamed response and yield the text chosen by extract.
+        
+        With prefixed=True lines are server-sent events ('data: {...}', ending
+        with '[DONE]'); otherwise each non-empty line is a bare JSON object.
+        Text is yielded once per network read, so callers can write each chunk
+        straight to the terminal without holding anything back.
+        """
+        buffer = b''
+        for data in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            lines = (buffer + data).split(b'\n')
+            buffer = lines.pop()  # Incomplete last line, finished by the next read
+            text, done = self._decode_lines(lines, extract, prefixed)
+            if text:
+                yield text
+            if done:
+                return
+        
+        if buffer:
+            text, _ = self._decode_lines([buffer], extract, prefixed)
+            if text:
+                yield text
+    
+    @staticmethod
+    def _decode_lines(lines: List[bytes], extract: Callable[[Dict[str, Any]], Iterable[str]], prefixed: bool) -> Tuple[str, bool]:
+        """Join the text of complete stream lines; also report whether the end marker was seen."""
+        parts = []
+        for line in lines:
+            line = line.rstrip(b'\r')
+            if not line:
+                continue
+            if prefixed:
+                if line[:6] != SSE_DATA_PREFIX:
+                    continue
+                line = line[6:]  # Remove 'data: ' prefix
+                if line == SSE_DONE:
+                    return "".join(parts), True
+            try:
+                json_data = json_loads(line)
+            except json.JSONDecodeError:
+                continue
+            parts.extend(extract(json_data))
+        return "".join(parts), False
     
     @abstractmethod
     def get_response(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
@@ -32,46 +113,48 @@ class BaseAIClient(ABC):
 class OpenAIClient(BaseAIClient):
     """OpenAI API client."""
     
+    MODELS = (
+        "gpt-4",
+        "gpt-4-turbo",
+        "gpt-3.5-turbo",
+        "gpt-3.5-turbo-16k"
+    )
+    
     def __init__(self, api_key: str):
         super().__init__(api_key)
         self.base_url = "https://api.openai.com/v1"
         self.default_model = "gpt-3.5-turbo"
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
     
     def get_response(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
         """Get response from OpenAI API."""
-        model = kwargs.get('model', self.default_model)
+        model = kwargs.get('model') or self.default_model
         temperature = kwargs.get('temperature', 0.7)
         max_tokens = kwargs.get('max_tokens')
         stream = kwargs.get('stream', False)
         
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        data = {
-            'model': model,
-            'messages': messages,
-            'temperature': temperature,
-            'stream': stream
-        }
-        
+        data = {'model': model, 'messages': messages}
+        if temperature is not None:
+            data['temperature'] = temperature
         if max_tokens:
             data['max_tokens'] = max_tokens
+        if stream:
+            data['stream'] = True
         
         try:
-            response = requests.post(
+            response = self._post(
                 f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
+                data=json_dumps(data),
                 stream=stream
             )
-            response.raise_for_status()
             
             if stream:
                 return self._handle_stream_response(response)
             else:
-                result = response.json()
+                result = json_loads(response.content)
                 return result['choices'][0]['message']['content']
                 
         except requests.exceptions.RequestException as e:
@@ -79,74 +162,66 @@ class OpenAIClient(BaseAIClient):
     
     def _handle_stream_response(self, response) -> Iterator[str]:
         """Handle streaming response from OpenAI."""
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]  # Remove 'data: ' prefix
-                    if data == '[DONE]':
-                        break
-                    try:
-                        json_data = json.loads(data)
-                        if 'choices' in json_data and json_data['choices']:
-                            delta = json_data['choices'][0].get('delta', {})
-                            if 'content' in delta:
-                                yield delta['content']
-                    except json.JSONDecodeError:
-                        continue
+        return self._iter_sse(response, self._extract_openai)
+    
+    @staticmethod
+    def _extract_openai(json_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield text from one OpenAI stream event."""
+        if 'choices' in json_data and json_data['choices']:
+            delta = json_data['choices'][0].get('delta', {})
+            if 'content' in delta:
+                yield delta['content']
     
     def get_available_models(self) -> List[str]:
         """Get available OpenAI models."""
-        return [
-            "gpt-4",
-            "gpt-4-turbo",
-            "gpt-3.5-turbo",
-            "gpt-3.5-turbo-16k"
-        ]
+        return list(self.MODELS)
 
 
 class AnthropicClient(BaseAIClient):
     """Anthropic Claude API client."""
     
+    MODELS = (
+        "claude-3-opus-20240229",
+        "claude-3-sonnet-20240229",
+        "claude-3-haiku-20240307",
+        "claude-2.1",
+        "claude-2.0"
+    )
+    
     def __init__(self, api_key: str):
         super().__init__(api_key)
         self.base_url = "https://api.anthropic.com/v1"
         self.default_model = "claude-3-sonnet-20240229"
+        self.session.headers.update({
+            'x-api-key': self.api_key,
+            'Content-Type': 'application/json',
+            'anthropic-version': '2023-06-01'
+        })
     
     def get_response(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
         """Get response from Anthropic API."""
-        model = kwargs.get('model', self.default_model)
+        model = kwargs.get('model') or self.default_model
         temperature = kwargs.get('temperature', 0.7)
-        max_tokens = kwargs.get('max_tokens', 1000)
+        max_tokens = kwargs.get('max_tokens') or 1000  # Required by the Messages API
         stream = kwargs.get('stream', False)
         
-        headers = {
-            'x-api-key': self.api_key,
-            'Content-Type': 'application/json',
-            'anthropic-version': '2023-06-01'
-        }
-        
-        data = {
-            'model': model,
-            'messages': messages,
-            'max_tokens': max_tokens,
-            'temperature': temperature,
-            'stream': stream
-        }
+        data = {'model': model, 'messages': messages, 'max_tokens': max_tokens}
+        if temperature is not None:
+            data['temperature'] = temperature
+        if stream:
+            data['stream'] = True
         
         try:
-            response = requests.post(
+            response = self._post(
                 f"{self.base_url}/messages",
-                headers=headers,
-                json=data,
+                data=json_dumps(data),
                 stream=stream
             )
-            response.raise_for_status()
             
             if stream:
                 return self._handle_stream_response(response)
             else:
-                result = response.json()
+                result = json_loads(response.content)
                 return result['content'][0]['text']
                 
         except requests.exceptions.RequestException as e:
@@ -154,76 +229,62 @@ class AnthropicClient(BaseAIClient):
     
     def _handle_stream_response(self, response) -> Iterator[str]:
         """Handle streaming response from Anthropic."""
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]  # Remove 'data: ' prefix
-                    if data == '[DONE]':
-                        break
-                    try:
-                        json_data = json.loads(data)
-                        if json_data.get('type') == 'content_block_delta':
-                            delta = json_data.get('delta', {})
-                            if 'text' in delta:
-                                yield delta['text']
-                    except json.JSONDecodeError:
-                        continue
+        return self._iter_sse(response, self._extract_anthropic)
+    
+    @staticmethod
+    def _extract_anthropic(json_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield text from one Anthropic stream event."""
+        if json_data.get('type') == 'content_block_delta':
+            delta = json_data.get('delta', {})
+            if 'text' in delta:
+                yield delta['text']
     
     def get_available_models(self) -> List[str]:
         """Get available Anthropic models."""
-        return [
-            "claude-3-opus-20240229",
-            "claude-3-sonnet-20240229",
-            "claude-3-haiku-20240307",
-            "claude-2.1",
-            "claude-2.0"
-        ]
+        return list(self.MODELS)
 
 
 class GeminiClient(BaseAIClient):
     """Google Gemini API client."""
     
+    MODELS = (
+        "gemini-pro",
+        "gemini-pro-vision"
+    )
+    
     def __init__(self, api_key: str):
         super().__init__(api_key)
         self.base_url = "https://generativelanguage.googleapis.com/v1beta"
         self.default_model = "gemini-pro"
+        self.session.headers.update({'Content-Type': 'application/json'})
+        self.session.params = {'key': self.api_key}
     
     def get_response(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
         """Get response from Gemini API."""
-        model = kwargs.get('model', self.default_model)
+        model = kwargs.get('model') or self.default_model
         temperature = kwargs.get('temperature', 0.7)
         stream = kwargs.get('stream', False)
         
         # Convert messages format for Gemini
         gemini_messages = self._convert_messages_format(messages)
         
-        params = {'key': self.api_key}
-        headers = {'Content-Type': 'application/json'}
-        
-        data = {
-            'contents': gemini_messages,
-            'generationConfig': {
-                'temperature': temperature
-            }
-        }
+        data = {'contents': gemini_messages}
+        if temperature is not None:
+            data['generationConfig'] = {'temperature': temperature}
         
         endpoint = "streamGenerateContent" if stream else "generateContent"
         
         try:
-            response = requests.post(
+            response = self._post(
                 f"{self.base_url}/models/{model}:{endpoint}",
-                params=params,
-                headers=headers,
-                json=data,
+                data=json_dumps(data),
                 stream=stream
             )
-            response.raise_for_status()
             
             if stream:
                 return self._handle_stream_response(response)
             else:
-                result = response.json()
+                result = json_loads(response.content)
                 return result['candidates'][0]['content']['parts'][0]['text']
                 
         except requests.exceptions.RequestException as e:
@@ -242,72 +303,68 @@ class GeminiClient(BaseAIClient):
     
     def _handle_stream_response(self, response) -> Iterator[str]:
         """Handle streaming response from Gemini."""
-        for line in response.iter_lines():
-            if line:
-                try:
-                    json_data = json.loads(line.decode('utf-8'))
-                    if 'candidates' in json_data and json_data['candidates']:
-                        candidate = json_data['candidates'][0]
-                        if 'content' in candidate:
-                            parts = candidate['content'].get('parts', [])
-                            for part in parts:
-                                if 'text' in part:
-                                    yield part['text']
-                except json.JSONDecodeError:
-                    continue
+        return self._iter_sse(response, self._extract_gemini, prefixed=False)
+    
+    @staticmethod
+    def _extract_gemini(json_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield text from one Gemini stream event."""
+        if 'candidates' in json_data and json_data['candidates']:
+            candidate = json_data['candidates'][0]
+            if 'content' in candidate:
+                for part in candidate['content'].get('parts', []):
+                    if 'text' in part:
+                        yield part['text']
     
     def get_available_models(self) -> List[str]:
         """Get available Gemini models."""
-        return [
-            "gemini-pro",
-            "gemini-pro-vision"
-        ]
+        return list(self.MODELS)
 
 
 class CohereClient(BaseAIClient):
     """Cohere API client."""
     
+    MODELS = (
+        "command",
+        "command-light",
+        "command-nightly"
+    )
+    
     def __init__(self, api_key: str):
         super().__init__(api_key)
         self.base_url = "https://api.cohere.ai/v1"
         self.default_model = "command"
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
     
     def get_response(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
         """Get response from Cohere API."""
-        model = kwargs.get('model', self.default_model)
+        model = kwargs.get('model') or self.default_model
         temperature = kwargs.get('temperature', 0.7)
-        max_tokens = kwargs.get('max_tokens', 1000)
+        max_tokens = kwargs.get('max_tokens') or 1000
         stream = kwargs.get('stream', False)
         
         # Convert messages to single prompt for Cohere
         prompt = self._convert_messages_to_prompt(messages)
         
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        data = {
-            'model': model,
-            'prompt': prompt,
-            'temperature': temperature,
-            'max_tokens': max_tokens,
-            'stream': stream
-        }
+        data = {'model': model, 'prompt': prompt, 'max_tokens': max_tokens}
+        if temperature is not None:
+            data['temperature'] = temperature
+        if stream:
+            data['stream'] = True
         
         try:
-            response = requests.post(
+            response = self._post(
                 f"{self.base_url}/generate",
-                headers=headers,
-                json=data,
+                data=json_dumps(data),
                 stream=stream
             )
-            response.raise_for_status()
             
             if stream:
                 return self._handle_stream_response(response)
             else:
-                result = response.json()
+                result = json_loads(response.content)
                 return result['generations'][0]['text']
                 
         except requests.exceptions.RequestException as e:
@@ -315,67 +372,63 @@ class CohereClient(BaseAIClient):
     
     def _convert_messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Convert messages to single prompt for Cohere."""
-        prompt = ""
-        for msg in messages:
-            role = msg['role'].capitalize()
-            content = msg['content']
-            prompt += f"{role}: {content}\n"
-        prompt += "Assistant:"
-        return prompt
+        lines = [f"{msg['role'].capitalize()}: {msg['content']}" for msg in messages]
+        lines.append("Assistant:")
+        return "\n".join(lines)
     
     def _handle_stream_response(self, response) -> Iterator[str]:
         """Handle streaming response from Cohere."""
-        for line in response.iter_lines():
-            if line:
-                try:
-                    json_data = json.loads(line.decode('utf-8'))
-                    if 'text' in json_data:
-                        yield json_data['text']
-                except json.JSONDecodeError:
-                    continue
+        return self._iter_sse(response, self._extract_cohere, prefixed=False)
+    
+    @staticmethod
+    def _extract_cohere(json_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield text from one Cohere stream event."""
+        if 'text' in json_data:
+            yield json_data['text']
     
     def get_available_models(self) -> List[str]:
         """Get available Cohere models."""
-        return [
-            "command",
-            "command-light",
-            "command-nightly"
-        ]
+        return list(self.MODELS)
 
 
 class HuggingFaceClient(BaseAIClient):
     """Hugging Face Inference API client."""
     
+    MODELS = (
+        "microsoft/DialoGPT-medium",
+        "microsoft/DialoGPT-large",
+        "facebook/blenderbot-400M-distill",
+        "gpt2"
+    )
+    
     def __init__(self, api_key: str):
         super().__init__(api_key)
         self.base_url = "https://api-inference.huggingface.co/models"
         self.default_model = "microsoft/DialoGPT-medium"
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
     
     def get_response(self, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
         """Get response from Hugging Face API."""
-        model = kwargs.get('model', self.default_model)
+        model = kwargs.get('model') or self.default_model
         
         # Convert messages to input text
         input_text = self._convert_messages_to_text(messages)
         
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {'inputs': input_text}
         
         try:
-            response = requests.post(
+            response = self._post(
                 f"{self.base_url}/{model}",
-                headers=headers,
-                json=data
+                data=json_dumps(data)
             )
-            response.raise_for_status()
             
-            result = response.json()
-            if isinstance(result, list) and result:
-                return result[0].get('generated_text', '')
+            # Text-generation models return [{"generated_text": ...}]
+            result = json_loads(response.content)
+            if isinstance(result, list):
+                return result[0].get('generated_text', '') if result else ''
             return str(result)
             
         except requests.exceptions.RequestException as e:
@@ -387,57 +440,136 @@ class HuggingFaceClient(BaseAIClient):
     
     def get_available_models(self) -> List[str]:
         """Get available Hugging Face models."""
-        return [
-            "microsoft/DialoGPT-medium",
-            "microsoft/DialoGPT-large",
-            "facebook/blenderbot-400M-distill",
-            "gpt2"
-        ]
+        return list(self.MODELS)
 
 
 class AIClientManager:
     """Manager for all AI API clients."""
     
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(self, config_manager: ConfigManager, use_cache: bool = True):
         self.config_manager = config_manager
+        self.cache = ResponseCache() if use_cache else None
         self.clients = {}
         self._initialize_clients()
     
     def _initialize_clients(self):
-        """Initialize all available AI clients."""
-        client_configs = {
+        """Register the client class for each provider; clients are built on first use."""
+        self._client_classes = {
             'openai': ('openai_api_key', OpenAIClient),
             'anthropic': ('anthropic_api_key', AnthropicClient),
             'gemini': ('gemini_api_key', GeminiClient),
             'cohere': ('cohere_api_key', CohereClient),
             'huggingface': ('huggingface_api_key', HuggingFaceClient),
         }
-        
-        for provider, (key_name, client_class) in client_configs.items():
-            api_key = self.config_manager.get(key_name)
-            if api_key:
-                try:
-                    self.clients[provider] = client_class(api_key)
-                except Exception as e:
-                    print(f"Warning: Failed to initialize {provider} client: {e}")
     
-    def get_response(self, provider: str, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
-        """Get response from specified AI provider."""
-        if provider not in self.clients:
-            available_providers = list(self.clients.keys())
+    def _get_client(self, provider: str) -> BaseAIClient:
+        """Get the client for a provider, constructing it on first access."""
+        client = self.clients.get(provider)
+        if client is not None:
+            return client
+        
+        available_providers = self.get_available_providers()
+        if provider not in available_providers:
             if not available_providers:
                 raise Exception("No AI providers configured. Please set API keys using --config-set")
             raise Exception(f"Provider '{provider}' not available. Available providers: {available_providers}")
         
-        return self.clients[provider].get_response(messages, **kwargs)
+        key_name, client_class = self._client_classes[provider]
+        try:
+            client = client_class(self.config_manager.get(key_name))
+        except Exception as e:
+            raise Exception(f"Failed to initialize {provider} client: {e}")
+        
+        self.clients[provider] = client
+        return client
+    
+    def get_response(self, provider: str, messages: List[Dict[str, str]], **kwargs) -> Union[str, Iterator[str]]:
+        """Get response from specified AI provider."""
+        client = self._get_client(provider)
+        
+        # Only deterministic, non-streaming requests are safe to cache
+        if self.cache is None or kwargs.get('stream') or kwargs.get('temperature', 0.7) != 0:
+            return client.get_response(messages, **kwargs)
+        
+        key = ResponseCache.make_key(provider, messages, **kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = client.get_response(messages, **kwargs)
+        self.cache.set(key, result)
+        return result
+    
+    def get_responses(self, providers: List[str], messages: List[Dict[str, str]], **kwargs) -> Dict[str, Union[str, Exception]]:
+        """Get responses from several providers concurrently.
+        
+        Requests run in parallel threads, so total latency is bounded by the
+        slowest provider rather than the sum of all of them. Failures are
+        returned in place of the response instead of being raised.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        providers = list(dict.fromkeys(providers))
+        kwargs['stream'] = False
+        
+        # One thread per provider: duplicates are dropped, so this is at most
+        # the handful of supported providers
+        with ThreadPoolExecutor(max_workers=max(1, len(providers))) as executor:
+            futures = {
+                provider: executor.submit(self.get_response, provider, messages, **kwargs)
+                for provider in providers
+            }
+        
+        results = {}
+        for provider, future in futures.items():
+            try:
+                results[provider] = future.result()
+            except Exception as e:
+                results[provider] = e
+        return results
+    
+    def race_response(self, providers: List[str], messages: List[Dict[str, str]], **kwargs) -> Tuple[str, str]:
+        """Send one request to several providers and return the first success.
+        
+        Returns a (provider, response) tuple. Each request runs in a daemon
+        thread, so slower providers are abandoned rather than awaited and
+        never delay exiting the CLI.
+        """
+        import queue
+        import threading
+        
+        providers = list(dict.fromkeys(providers))
+        if not providers:
+            raise Exception("No providers given")
+        kwargs['stream'] = False
+        
+        results = queue.Queue()
+        
+        def worker(provider: str):
+            try:
+                results.put((provider, self.get_response(provider, messages, **kwargs), None))
+            except Exception as e:
+                results.put((provider, None, e))
+        
+        for provider in providers:
+            threading.Thread(target=worker, args=(provider,), daemon=True).start()
+        
+        errors = []
+        for _ in providers:
+            provider, response, error = results.get()
+            if error is None:
+                return provider, response
+            errors.append(f"{provider}: {error}")
+        
+        raise Exception(f"All providers failed ({'; '.join(errors)})")
     
     def get_available_models(self, provider: str) -> List[str]:
         """Get available models for specified provider."""
-        if provider not in self.clients:
-            raise Exception(f"Provider '{provider}' not available")
-        
-        return self.clients[provider].get_available_models()
+        return self._get_client(provider).get_available_models()
     
     def get_available_providers(self) -> List[str]:
-        """Get list of available providers."""
-        return list(self.clients.keys())
\ No newline at end of file
+        """Get list of providers that have an API key configured."""
+        return [
+            provider for provider, (key_name, _) in self._client_classes.items()
+            if self.config_manager.get(key_name)
+        ]
\ No newline at end of file
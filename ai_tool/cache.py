@@ -0,0 +1,86 @@
+"""
+Response Cache for Termux AI Tool
+Stores deterministic (temperature 0) responses on disk to avoid repeat API calls
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+
+from .utils import json_dumps, json_loads
+
+
+class ResponseCache:
+    """Simple file-backed cache for AI responses."""
+    
+    def __init__(self, cache_dir: Optional[Path] = None, expire: int = 86400):
+        self.cache_dir = cache_dir or Path.home() / '.config' / 'termux-ai-tool' / 'cache'
+        self.expire = expire
+    
+    @staticmethod
+    def make_key(provider: str, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Build a stable cache key for a request."""
+        payload = json.dumps(
+            [provider, kwargs.get('model'), kwargs.get('max_tokens'), messages],
+            sort_keys=True
+        )
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get cached response, or None if missing or expired."""
+        entry_file = self.cache_dir / key
+        try:
+            entry = json_loads(entry_file.read_bytes())
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return None
+        
+        if entry.get('expires', 0) < time.time():
+            try:
+                os.remove(entry_file)
+            except OSError:
+                pass
+            return None
+        return entry.get('response')
+    
+    def set(self, key: str, response: Any):
+        """Store a response in the cache and drop expired entries."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Responses may echo private prompts, so keep entries owner-only
+            fd = os.open(self.cache_dir / key, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json_dumps({'expires': time.time() + self.expire, 'response': response}))
+        except IOError:
+            return  # Caching is best-effort
+        self.sweep()
+    
+    def sweep(self):
+        """Remove entries older than the expiry time."""
+        cutoff = time.time() - self.expire
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                # Entries are written once, so mtime + expire is their expiry
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+    
+    def clear(self) -> int:
+        """Remove all cached responses and return how many were removed."""
+        if not self.cache_dir.exists():
+            return 0
+        removed = 0
+        for entry_file in self.cache_dir.iterdir():
+            try:
+                entry_file.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
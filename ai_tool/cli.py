@@ -8,11 +8,17 @@ import argparse
 import sys
 import os
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
 
-from .config import ConfigManager
-from .api_clients import AIClientManager
-from .utils import print_response, handle_error
+from .config import ConfigManager, SENSITIVE_KEY_RE, get_config
+from .utils import print_response, print_stream, handle_error
+from .cache import ResponseCache
+
+if TYPE_CHECKING:
+    from .api_clients import AIClientManager
+
+
+SUPPORTED_PROVIDERS = ["openai", "anthropic", "gemini", "cohere", "huggingface"]
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -25,18 +31,33 @@ Examples:
   %(prog)s --provider openai --prompt "Hello, world!"
   %(prog)s --provider anthropic --prompt "Explain quantum computing"
   %(prog)s --provider gemini --prompt "Write a Python script"
+  %(prog)s --providers openai,anthropic --prompt "Compare answers"
+  %(prog)s --providers openai,gemini --race --prompt "Fastest answer wins"
   %(prog)s --config-set openai_api_key YOUR_API_KEY
   %(prog)s --list-providers
+  %(prog)s --clear-cache
         """
     )
     
     # Main arguments
     parser.add_argument(
         "--provider", "-p",
-        choices=["openai", "anthropic", "gemini", "cohere", "huggingface"],
+        choices=SUPPORTED_PROVIDERS,
         help="AI provider to use"
     )
     
+    parser.add_argument(
+        "--providers",
+        type=str,
+        help="Comma-separated providers to query concurrently (e.g., openai,anthropic)"
+    )
+    
+    parser.add_argument(
+        "--race",
+        action="store_true",
+        help="With --providers, print only the first provider to respond"
+    )
+    
     parser.add_argument(
         "--prompt", "-q",
         type=str,
@@ -68,6 +89,18 @@ Examples:
         help="Stream the response in real-time"
     )
     
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the local response cache (used when temperature is 0)"
+    )
+    
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete all cached responses"
+    )
+    
     # Configuration commands
     parser.add_argument(
         "--config-set",
@@ -111,10 +144,15 @@ Examples:
     return parser
 
 
-def interactive_mode(client_manager: AIClientManager, provider: str, model: Optional[str] = None):
+def interactive_mode(client_manager: 'AIClientManager', provider: str, model: Optional[str] = None):
     """Start interactive chat mode."""
+    try:
+        import readline  # Enables line editing and history for input()
+    except ImportError:
+        pass
+    
     print(f"Starting interactive mode with {provider}")
-    print("Type 'quit', 'exit', or Ctrl+C to stop")
+    print("Type 'quit', 'exit', or Ctrl+C to stop (Ctrl+C during a reply skips it)")
     print("-" * 50)
     
     conversation_history = []
@@ -123,16 +161,20 @@ def interactive_mode(client_manager: AIClientManager, provider: str, model: Opti
         while True:
             try:
                 user_input = input("You: ").strip()
-                
-                if user_input.lower() in ['quit', 'exit']:
-                    break
-                
-                if not user_input:
-                    continue
-                
-                # Add user message to history
-                conversation_history.append({"role": "user", "content": user_input})
-                
+            except EOFError:
+                print("\n\nGoodbye!")
+                break
+            
+            if user_input.lower() in ['quit', 'exit']:
+                break
+            
+            if not user_input:
+                continue
+            
+            # Add user message to history
+            conversation_history.append({"role": "user", "content": user_input})
+            
+            try:
                 # Get AI response
                 response = client_manager.get_response(
                     provider=provider,
@@ -142,35 +184,28 @@ def interactive_mode(client_manager: AIClientManager, provider: str, model: Opti
                 )
                 
                 print("AI: ", end="")
-                full_response = ""
-                for chunk in response:
-                    if chunk:
-                        print(chunk, end="", flush=True)
-                        full_response += chunk
+                full_response = print_stream(response)
                 print()  # New line after response
                 
-                # Add AI response to history
-                conversation_history.append({"role": "assistant", "content": full_response})
-                
             except KeyboardInterrupt:
-                print("\n\nGoodbye!")
-                break
+                # Drop the unanswered turn and return to the prompt
+                conversation_history.pop()
+                print("\n[Response interrupted]")
+                continue
             except Exception as e:
+                conversation_history.pop()
                 print(f"\nError: {e}")
+                continue
+            
+            # Add AI response to history
+            conversation_history.append({"role": "assistant", "content": full_response})
                 
     except KeyboardInterrupt:
         print("\n\nGoodbye!")
 
 
-def main():
-    """Main entry point for the CLI."""
-    parser = create_parser()
-    args = parser.parse_args()
-    
-    # Initialize configuration manager
-    config_manager = ConfigManager()
-    
-    # Handle configuration commands
+def handle_config_command(config_manager: ConfigManager, args: argparse.Namespace):
+    """Handle --config-set, --config-get and --config-list."""
     if args.config_set:
         key, value = args.config_set
         config_manager.set(key, value)
@@ -185,33 +220,61 @@ def main():
             print(f"Configuration key '{args.config_get}' not found")
         return
     
-    if args.config_list:
-        config = config_manager.get_all()
-        print("Configuration:")
-        for key, value in config.items():
-            # Hide API keys for security
-            if 'api_key' in key.lower() or 'token' in key.lower():
-                value = '*' * 8 if value else 'Not set'
-            print(f"  {key}: {value}")
-        return
+    config = config_manager.get_all()
+    print("Configuration:")
+    for key, value in config.items():
+        # Hide API keys for security
+        if SENSITIVE_KEY_RE.search(key):
+            value = '*' * 8 if value else 'Not set'
+        print(f"  {key}: {value}")
+
+
+def main():
+    """Main entry point for the CLI."""
+    parser = create_parser()
+    args = parser.parse_args()
     
+    # Cheap commands that need neither configuration nor API clients
     if args.list_providers:
-        providers = ["openai", "anthropic", "gemini", "cohere", "huggingface"]
         print("Available providers:")
-        for provider in providers:
+        for provider in SUPPORTED_PROVIDERS:
             print(f"  - {provider}")
         return
     
+    if args.clear_cache:
+        removed = ResponseCache().clear()
+        print(f"Removed {removed} cached response(s).")
+        return
+    
+    # Initialize configuration manager
+    config_manager = get_config()
+    
+    # Handle configuration commands
+    if args.config_set or args.config_get or args.config_list:
+        handle_config_command(config_manager, args)
+        return
+    
     # Validate required arguments for AI requests
-    if not args.provider and not args.interactive:
+    providers = []
+    if args.providers:
+        providers = [p.strip() for p in args.providers.split(",") if p.strip()]
+        invalid = [p for p in providers if p not in SUPPORTED_PROVIDERS]
+        if invalid:
+            parser.error(f"Unknown provider(s): {', '.join(invalid)}")
+    
+    if not args.provider and not providers and not args.interactive:
         parser.error("--provider is required for AI requests")
     
+    if args.race and not providers:
+        parser.error("--race requires --providers")
+    
     if not args.prompt and not args.interactive:
         parser.error("--prompt is required for AI requests")
     
-    # Initialize AI client manager
+    # Initialize AI client manager (imported here to keep config commands fast)
+    from .api_clients import AIClientManager
     try:
-        client_manager = AIClientManager(config_manager)
+        client_manager = AIClientManager(config_manager, use_cache=not args.no_cache)
     except Exception as e:
         handle_error(f"Failed to initialize AI clients: {e}")
         sys.exit(1)
@@ -220,15 +283,44 @@ def main():
         # Interactive mode
         if args.interactive:
             provider = args.provider or input("Choose provider (openai/anthropic/gemini/cohere/huggingface): ").strip()
-            if provider not in ["openai", "anthropic", "gemini", "cohere", "huggingface"]:
+            if provider not in SUPPORTED_PROVIDERS:
                 print("Invalid provider selected")
                 sys.exit(1)
             interactive_mode(client_manager, provider, args.model)
             return
         
-        # Single prompt mode
         messages = [{"role": "user", "content": args.prompt}]
         
+        # Race mode: first successful provider wins
+        if providers and args.race:
+            winner, response = client_manager.race_response(
+                providers=providers,
+                messages=messages,
+                temperature=args.temperature,
+                max_tokens=args.max_tokens
+            )
+            print(f"=== {winner} (first to respond) ===")
+            print_response(response)
+            return
+        
+        # Multi-provider mode (each provider uses its default model)
+        if providers:
+            results = client_manager.get_responses(
+                providers=providers,
+                messages=messages,
+                temperature=args.temperature,
+                max_tokens=args.max_tokens
+            )
+            for provider, result in results.items():
+                print(f"=== {provider} ===")
+                if isinstance(result, Exception):
+                    print(f"Error: {result}")
+                else:
+                    print_response(result)
+                print()
+            return
+        
+        # Single prompt mode
         response = client_manager.get_response(
             provider=args.provider,
             messages=messages,
@@ -239,9 +331,7 @@ def main():
         )
         
         if args.stream:
-            for chunk in response:
-                if chunk:
-                    print(chunk, end="", flush=True)
+            print_stream(response)
             print()  # New line after response
         else:
             print_response(response)
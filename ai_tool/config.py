@@ -4,10 +4,19 @@ Handles storing and retrieving API keys and settings
 """
 
 import os
+import re
 import json
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
 from pathlib import Path
 
+from .utils import json_dumps, json_loads
+
+
+# Keys whose values must never be displayed or exported
+SENSITIVE_KEY_RE = re.compile(r'api[_-]?key|token|secret|password', re.IGNORECASE)
+
 
 class ConfigManager:
     """Manages configuration for the AI tool."""
@@ -16,8 +25,17 @@ class ConfigManager:
         # Use Termux-specific directory structure
         self.config_dir = Path.home() / '.config' / 'termux-ai-tool'
         self.config_file = self.config_dir / 'config.json'
-        self.ensure_config_dir()
-        self.config = self.load_config()
+        self._config = None
+        self._dirty = False
+        self._batch_depth = 0
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Configuration dictionary, loaded from disk on first access."""
+        if self._config is None:
+            self.ensure_config_dir()
+            self._config = self.load_config()
+        return self._config
     
     def ensure_config_dir(self):
         """Ensure configuration directory exists."""
@@ -33,8 +51,7 @@ class ConfigManager:
         """Load configuration from file."""
         if self.config_file.exists():
             try:
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
+                return json_loads(self.config_file.read_bytes())
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Warning: Failed to load config file: {e}")
                 return {}
@@ -42,15 +59,24 @@ class ConfigManager:
     
     def save_config(self):
         """Save configuration to file."""
+        # Encode in memory first so the file is written in one call
+        payload = json_dumps(self.config, indent=True)
+        # Write to a temporary file and rename it over the config, so a crash
+        # mid-write can never leave a truncated config.json behind
+        tmp_file = self.config_file.with_suffix('.json.tmp')
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            # Create the file owner-only so the keys are never readable by others
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                # A stale temp file from an earlier crash keeps its old mode
+                try:
+                    os.chmod(tmp_file, 0o600)
+                except OSError:
+                    pass  # Ignore if we can't set permissions
+                f.write(payload)
             
-            # Set appropriate permissions for the config file
-            try:
-                os.chmod(self.config_file, 0o600)
-            except OSError:
-                pass  # Ignore if we can't set permissions
+            os.replace(tmp_file, self.config_file)
+            self._dirty = False
                 
         except IOError as e:
             raise Exception(f"Failed to save configuration: {e}")
@@ -59,16 +85,29 @@ class ConfigManager:
         """Get configuration value."""
         return self.config.get(key, default)
     
+    @staticmethod
+    def _clean_value(key: str, value: Any) -> Any:
+        """Strip surrounding whitespace from API keys so pasted keys work."""
+        if key.endswith('_api_key') and isinstance(value, str):
+            return value.strip()
+        return value
+    
     def set(self, key: str, value: Any):
         """Set configuration value."""
-        self.config[key] = value
-        self.save_config()
+        self.config[key] = self._clean_value(key, value)
+        self._mark_dirty()
+    
+    def set_many(self, values: Dict[str, Any]):
+        """Set several configuration values with a single write."""
+        if values:
+            self.config.update({key: self._clean_value(key, value) for key, value in values.items()})
+            self._mark_dirty()
     
     def delete(self, key: str) -> bool:
         """Delete configuration key."""
         if key in self.config:
             del self.config[key]
-            self.save_config()
+            self._mark_dirty()
             return True
         return False
     
@@ -79,20 +118,42 @@ class ConfigManager:
     def clear(self):
         """Clear all configuration."""
         self.config.clear()
-        self.save_config()
+        self._mark_dirty()
+    
+    def flush(self):
+        """Write pending changes to disk."""
+        if self._dirty:
+            self.save_config()
+    
+    @contextmanager
+    def batch(self) -> Iterator['ConfigManager']:
+        """Group several changes so the config file is written once on exit."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+    
+    def _mark_dirty(self):
+        """Record a change and save it unless a batch is open."""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self.flush()
     
     def export_config(self, file_path: str):
         """Export configuration to a file."""
-        export_config = self.config.copy()
-        
         # Mask sensitive values
-        for key in export_config:
-            if 'api_key' in key.lower() or 'token' in key.lower() or 'secret' in key.lower():
-                export_config[key] = '***masked***'
+        export_config = {
+            key: '***masked***' if SENSITIVE_KEY_RE.search(key) else value
+            for key, value in self.config.items()
+        }
         
+        payload = json_dumps(export_config, indent=True)
         try:
-            with open(file_path, 'w') as f:
-                json.dump(export_config, f, indent=2)
+            with open(file_path, 'wb') as f:
+                f.write(payload)
             print(f"Configuration exported to {file_path} (API keys masked)")
         except IOError as e:
             raise Exception(f"Failed to export configuration: {e}")
@@ -100,12 +161,10 @@ class ConfigManager:
     def import_config(self, file_path: str):
         """Import configuration from a file."""
         try:
-            with open(file_path, 'r') as f:
-                imported_config = json.load(f)
+            imported_config = json_loads(Path(file_path).read_bytes())
             
             # Merge with existing config
-            self.config.update(imported_config)
-            self.save_config()
+            self.set_many(imported_config)
             print(f"Configuration imported from {file_path}")
         except (json.JSONDecodeError, IOError) as e:
             raise Exception(f"Failed to import configuration: {e}")
@@ -120,12 +179,8 @@ class ConfigManager:
             'huggingface_api_key': 'Hugging Face'
         }
         
-        validation_results = {}
-        for key, provider in required_keys.items():
-            value = self.get(key)
-            validation_results[provider] = bool(value and len(value.strip()) > 0)
-        
-        return validation_results
+        # set() and set_many() strip API keys, so a whitespace-only key is empty
+        return {provider: bool(self.get(key)) for key, provider in required_keys.items()}
     
     def get_provider_settings(self, provider: str) -> Dict[str, Any]:
         """Get settings specific to a provider."""
@@ -171,6 +226,8 @@ class ConfigManager:
             }
         }
         
+        # Collect entered keys and save them with a single write
+        pending = {}
         for provider_id, info in providers.items():
             print(f"\n{info['name']}:")
             print(f"  {info['help']}")
@@ -187,12 +244,14 @@ class ConfigManager:
                 if not api_key:
                     break
                 if len(api_key) > 10:  # Basic validation
-                    self.set(info['key'], api_key)
+                    pending[info['key']] = api_key
                     print(f"  ✓ API key saved for {info['name']}")
                     break
                 else:
                     print("  Invalid API key. Please try again.")
         
+        self.set_many(pending)
+        
         print("\n" + "=" * 50)
         print("Configuration complete!")
         
@@ -207,6 +266,12 @@ class ConfigManager:
             print("  termux-ai --config-set <provider>_api_key <your_api_key>")
 
 
+@lru_cache(maxsize=1)
+def get_config() -> ConfigManager:
+    """Get the shared ConfigManager so config.json is parsed once per process."""
+    return ConfigManager()
+
+
 def create_example_config() -> Dict[str, Any]:
     """Create an example configuration dictionary."""
     return {
@@ -6,9 +6,71 @@ import sys
 import os
 import json
 import time
-from typing import Any, Dict, Optional
+import shutil
+import socket
+import platform
+import atexit
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 from datetime import datetime
-import re
+
+try:
+    import orjson
+except ImportError:  # orjson is optional (pip install termux-ai-tool[fast])
+    orjson = None
+
+
+# JSON helpers: orjson when available, otherwise the stdlib. Both accept bytes
+# when loading and json_dumps always returns UTF-8 bytes.
+if orjson is not None:
+    json_loads = orjson.loads
+    
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+else:
+    json_loads = json.loads
+    
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        if indent:
+            return json.dumps(obj, indent=2).encode('utf-8')
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+# Android release property in /system/build.prop
+ANDROID_VERSION_PROP = 'ro.build.version.release='
+
+# ANSI escape codes used by print_colored_text
+COLOR_CODES = {
+    "red": "\033[91m",
+    "green": "\033[92m",
+    "yellow": "\033[93m",
+    "blue": "\033[94m",
+    "magenta": "\033[95m",
+    "cyan": "\033[96m",
+    "white": "\033[97m",
+    "reset": "\033[0m"
+}
+COLOR_RESET = COLOR_CODES["reset"]
+
+# Basic (min_length, prefix) checks for API keys of each provider
+API_KEY_RULES = {
+    'openai': (20, 'sk-'),
+    'anthropic': (20, 'sk-ant-'),
+    'gemini': (30, None),
+    'cohere': (20, None),
+    'huggingface': (20, 'hf_')
+}
+
+# Usage log handle, opened lazily by log_request and closed at exit
+_log_file = None
+_log_lock = threading.Lock()
+
+# usage.log is rotated to usage.log.1 once it reaches this size
+USAGE_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+# usage.summary.json caches the totals of usage.log up to a recorded byte
+# offset, so stats only ever scan entries appended since the last update
 
 
 def print_response(response: str, prefix: str = "AI: "):
@@ -20,6 +82,24 @@ def print_response(response: str, prefix: str = "AI: "):
     print(f"{prefix}{response}")
 
 
+def print_stream(chunks: Iterable[str]) -> str:
+    """Print streamed chunks as they arrive and return the full text.
+    
+    Clients yield one chunk per network read, so each chunk is already a
+    batch of tokens and is written immediately rather than held back.
+    """
+    parts = []
+    
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts.append(chunk)
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+    
+    return "".join(parts)
+
+
 def handle_error(error_msg: str, exit_code: int = 1):
     """Handle and display errors."""
     print(f"Error: {error_msg}", file=sys.stderr)
@@ -43,20 +123,8 @@ def print_banner():
 
 def print_colored_text(text: str, color: str = "white"):
     """Print colored text for better UX in terminal."""
-    color_codes = {
-        "red": "\033[91m",
-        "green": "\033[92m",
-        "yellow": "\033[93m",
-        "blue": "\033[94m",
-        "magenta": "\033[95m",
-        "cyan": "\033[96m",
-        "white": "\033[97m",
-        "reset": "\033[0m"
-    }
-    
-    color_code = color_codes.get(color.lower(), color_codes["white"])
-    reset_code = color_codes["reset"]
-    print(f"{color_code}{text}{reset_code}")
+    color_code = COLOR_CODES.get(color) or COLOR_CODES.get(color.lower(), COLOR_CODES["white"])
+    sys.stdout.write(f"{color_code}{text}{COLOR_RESET}\n")
 
 
 def validate_api_key(api_key: str, provider: str) -> bool:
@@ -66,26 +134,12 @@ def validate_api_key(api_key: str, provider: str) -> bool:
     
     api_key = api_key.strip()
     
-    # Basic length and format checks for different providers
-    validation_rules = {
-        'openai': {'min_length': 20, 'prefix': 'sk-'},
-        'anthropic': {'min_length': 20, 'prefix': 'sk-ant-'},
-        'gemini': {'min_length': 30, 'prefix': None},
-        'cohere': {'min_length': 20, 'prefix': None},
-        'huggingface': {'min_length': 20, 'prefix': 'hf_'}
-    }
-    
-    rule = validation_rules.get(provider.lower())
+    rule = API_KEY_RULES.get(provider.lower())
     if not rule:
         return len(api_key) > 10  # Generic validation
     
-    if len(api_key) < rule['min_length']:
-        return False
-    
-    if rule['prefix'] and not api_key.startswith(rule['prefix']):
-        return False
-    
-    return True
+    min_length, prefix = rule
+    return len(api_key) >= min_length and (prefix is None or api_key.startswith(prefix))
 
 
 def format_model_list(models: list, provider: str) -> str:
@@ -117,12 +171,9 @@ def parse_key_value_pairs(pairs: list) -> Dict[str, str]:
     """Parse key-value pairs from command line arguments."""
     result = {}
     for pair in pairs:
-        if '=' in pair:
-            key, value = pair.split('=', 1)
-            result[key.strip()] = value.strip()
-        else:
-            # Treat as boolean flag
-            result[pair.strip()] = True
+        key, sep, value = pair.partition('=')
+        # Entries without '=' are treated as boolean flags
+        result[key.strip()] = value.strip() if sep else True
     return result
 
 
@@ -135,7 +186,6 @@ def create_config_backup(config_path: str) -> str:
     backup_path = f"{config_path}.backup_{timestamp}"
     
     try:
-        import shutil
         shutil.copy2(config_path, backup_path)
         return backup_path
     except Exception as e:
@@ -161,10 +211,10 @@ def check_termux_environment() -> Dict[str, Any]:
     # Check Android version
     try:
         with open('/system/build.prop', 'r') as f:
-            content = f.read()
-            version_match = re.search(r'ro.build.version.release=(.+)', content)
-            if version_match:
-                env_info['android_version'] = version_match.group(1).strip()
+            for line in f:
+                if line.startswith(ANDROID_VERSION_PROP):
+                    env_info['android_version'] = line.split('=', 1)[1].strip()
+                    break
     except (FileNotFoundError, PermissionError):
         pass
     
@@ -204,16 +254,21 @@ def setup_termux_permissions():
     print(f"Architecture: {env_info['architecture']}")
 
 
-def check_internet_connection() -> bool:
-    """Check if internet connection is available."""
+@lru_cache(maxsize=1)
+def _check_internet_cached(time_bucket: int) -> bool:
+    """Probe connectivity once per time bucket."""
     try:
-        import socket
-        socket.create_connection(("8.8.8.8", 53), timeout=3)
-        return True
+        with socket.create_connection(("8.8.8.8", 53), timeout=1.5):
+            return True
     except OSError:
         return False
 
 
+def check_internet_connection() -> bool:
+    """Check if internet connection is available (result cached for 30 seconds)."""
+    return _check_internet_cached(int(time.time() // 30))
+
+
 def get_system_info() -> Dict[str, str]:
     """Get system information for debugging."""
     info = {}
@@ -226,7 +281,6 @@ def get_system_info() -> Dict[str, str]:
         pass
     
     try:
-        import platform
         info['system'] = platform.system()
         info['release'] = platform.release()
         info['machine'] = platform.machine()
@@ -240,70 +294,178 @@ def get_system_info() -> Dict[str, str]:
     return info
 
 
-def log_request(provider: str, model: str, prompt_length: int, response_length: int):
-    """Log API requests for usage tracking."""
-    log_dir = os.path.expanduser("~/.config/termux-ai-tool/logs")
-    os.makedirs(log_dir, exist_ok=True)
+def _usage_path(name: str) -> str:
+    """Path of a file in the usage log directory."""
+    return os.path.join(os.path.expanduser("~/.config/termux-ai-tool/logs"), name)
+
+
+def _get_log_file():
+    """Open the usage log on first use and keep it open for the process."""
+    global _log_file
+    if _log_file is None:
+        os.makedirs(os.path.dirname(_usage_path("usage.log")), exist_ok=True)
+        # Unbuffered binary append: each entry is a single write
+        _log_file = open(_usage_path("usage.log"), 'ab', buffering=0)
+    return _log_file
+
+
+def _close_log_file():
+    """Close the cached usage log handle, if any."""
+    global _log_file
+    with _log_lock:
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+
+def _empty_usage_summary() -> Dict[str, Any]:
+    """Summary covering no log entries."""
+    return {'calls': 0, 'tokens': 0, 'providers': {}, 'models': {}, 'log_offset': 0}
+
+
+def _load_usage_summary() -> Dict[str, Any]:
+    """Read usage.summary.json, or start an empty summary if it is missing or unreadable."""
+    try:
+        with open(_usage_path("usage.summary.json"), 'rb') as f:
+            summary = json_loads(f.read())
+        summary.setdefault('log_offset', 0)
+        return summary
+    except (FileNotFoundError, json.JSONDecodeError):
+        return _empty_usage_summary()
+
+
+def _save_usage_summary(summary: Dict[str, Any]):
+    """Atomically write usage.summary.json."""
+    summary_file = _usage_path("usage.summary.json")
+    tmp_file = f"{summary_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(json_dumps(summary))
+    os.replace(tmp_file, summary_file)
+
+
+def _catch_up_usage_summary(summary: Dict[str, Any]) -> bool:
+    """Fold log entries written after summary['log_offset'] into the summary.
+    
+    Returns True if the summary changed. Only complete lines are counted, so
+    an entry still being written by another process is picked up next time.
+    """
+    log_file = _usage_path("usage.log")
+    try:
+        log_size = os.path.getsize(log_file)
+    except OSError:
+        return False
+    
+    # A log smaller than the offset was replaced (e.g. rotated); count it from the start
+    offset = summary['log_offset'] if summary['log_offset'] <= log_size else 0
+    if offset == log_size:
+        if offset != summary['log_offset']:
+            summary['log_offset'] = offset
+            return True
+        return False
+    
+    total_tokens = 0
     
-    log_file = os.path.join(log_dir, "usage.log")
+    def usage_keys(f) -> Iterator[Tuple[str, str]]:
+        nonlocal offset, total_tokens
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            try:
+                entry = json_loads(line)
+            except json.JSONDecodeError:
+                continue
+            total_tokens += entry.get('prompt_tokens', 0) + entry.get('response_tokens', 0)
+            yield entry['provider'], entry['model']
     
+    # Count (provider, model) pairs in a single streaming pass
+    usage = Counter()
+    with open(log_file, 'rb') as f:
+        f.seek(offset)
+        usage.update(usage_keys(f))
+    
+    providers = summary['providers']
+    models = summary['models']
+    for (provider, model), count in usage.items():
+        providers[provider] = providers.get(provider, 0) + count
+        models[model] = models.get(model, 0) + count
+    summary['calls'] += sum(usage.values())
+    summary['tokens'] += total_tokens
+    summary['log_offset'] = offset
+    return True
+
+
+def _update_usage_summary() -> Dict[str, Any]:
+    """Bring usage.summary.json up to date with usage.log and return it."""
+    summary = _load_usage_summary()
+    if _catch_up_usage_summary(summary):
+        _save_usage_summary(summary)
+    return summary
+
+
+def _rotate_usage_log():
+    """Move usage.log to usage.log.1 after folding it into the summary.
+    
+    Must be called with _log_lock held and the log handle closed.
+    """
+    summary = _load_usage_summary()
+    _catch_up_usage_summary(summary)
+    os.replace(_usage_path("usage.log"), _usage_path("usage.log.1"))
+    summary['log_offset'] = 0
+    _save_usage_summary(summary)
+
+
+atexit.register(_close_log_file)
+
+
+def log_request(provider: str, model: str, prompt_length: int, response_length: int):
+    """Log API requests for usage tracking."""
+    global _log_file
     timestamp = datetime.now().isoformat()
     log_entry = {
         'timestamp': timestamp,
         'provider': provider,
         'model': model,
-        'prompt_tokens': estimate_tokens(str(prompt_length)),
-        'response_tokens': estimate_tokens(str(response_length))
+        # Lengths are character counts; ~4 characters per token (see estimate_tokens)
+        'prompt_tokens': prompt_length // 4,
+        'response_tokens': response_length // 4
     }
     
     try:
-        with open(log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        with _log_lock:
+            log_fp = _get_log_file()
+            log_fp.write(json_dumps(log_entry) + b'\n')
+            
+            # Keep one previous log once the current one reaches the size cap
+            if log_fp.tell() >= USAGE_LOG_MAX_BYTES:
+                log_fp.close()
+                _log_file = None
+                _rotate_usage_log()
     except Exception:
         pass  # Fail silently for logging
 
 
 def show_usage_stats():
     """Show usage statistics."""
-    log_file = os.path.expanduser("~/.config/termux-ai-tool/logs/usage.log")
-    
-    if not os.path.exists(log_file):
-        print("No usage data found.")
-        return
-    
     try:
-        with open(log_file, 'r') as f:
-            lines = f.readlines()
-        
-        print(f"Total API calls: {len(lines)}")
+        with _log_lock:
+            summary = _update_usage_summary()
         
-        providers = {}
-        models = {}
-        total_tokens = 0
+        if not summary['calls']:
+            print("No usage data found.")
+            return
         
-        for line in lines:
-            try:
-                entry = json.loads(line.strip())
-                provider = entry['provider']
-                model = entry['model']
-                tokens = entry.get('prompt_tokens', 0) + entry.get('response_tokens', 0)
-                
-                providers[provider] = providers.get(provider, 0) + 1
-                models[model] = models.get(model, 0) + 1
-                total_tokens += tokens
-                
-            except json.JSONDecodeError:
-                continue
+        print(f"Total API calls: {summary['calls']}")
         
         print(f"\nProviders used:")
-        for provider, count in sorted(providers.items()):
+        for provider, count in sorted(summary['providers'].items()):
             print(f"  {provider}: {count} calls")
         
         print(f"\nTop models:")
-        for model, count in sorted(models.items(), key=lambda x: x[1], reverse=True)[:5]:
+        for model, count in Counter(summary['models']).most_common(5):
             print(f"  {model}: {count} calls")
         
-        print(f"\nApproximate total tokens: {total_tokens}")
+        print(f"\nApproximate total tokens: {summary['tokens']}")
         
     except Exception as e:
         print(f"Error reading usage stats: {e}")
@@ -311,11 +473,16 @@ def show_usage_stats():
 
 def clear_usage_stats():
     """Clear usage statistics."""
-    log_file = os.path.expanduser("~/.config/termux-ai-tool/logs/usage.log")
+    _close_log_file()
     
     try:
-        if os.path.exists(log_file):
-            os.remove(log_file)
+        removed = False
+        for name in ("usage.log", "usage.log.1", "usage.summary.json"):
+            if os.path.exists(_usage_path(name)):
+                os.remove(_usage_path(name))
+                removed = True
+        
+        if removed:
             print("Usage statistics cleared.")
         else:
             print("No usage data to clear.")
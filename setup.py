@@ -43,6 +43,9 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=read_requirements(),
+    extras_require={
+        "fast": ["orjson>=3.6.0", "brotli>=1.0.9"],
+    },
     entry_points={
         "console_scripts": [
             "termux-ai=ai_tool.cli:main",